@@ -0,0 +1,46 @@
+"""
+can_analysis.py - análise de alternância de bits por CAN ID
+
+Conta, para cada CAN ID, quantas vezes cada bit do payload mudou entre
+frames consecutivos. Usado pelo modo de análise (tecla 'a') dos sniffers
+(can_tui.py) para mostrar quais bits variam, ajudando a separar
+contadores, flags e sinais no trabalho de engenharia reversa.
+
+Os bits são numerados sobre o payload (até 8 bytes) lido como um inteiro
+big-endian de 64 bits: o bit 63 é o MSB do byte 0 e o bit 0 o LSB do byte 7.
+"""
+
+
+class BitToggles:
+    """Contadores de alternância por bit de um CAN ID."""
+    __slots__ = ('counts', 'mask')
+
+    def __init__(self):
+        self.counts = [0] * 64  # alternâncias por bit
+        self.mask = 0           # bits que já alternaram ao menos uma vez
+
+    def update(self, prev, raw):
+        """Registra a transição do payload 'prev' para 'raw' (bytes)."""
+        diff = (int.from_bytes(prev.ljust(8, b'\0'), 'big')
+                ^ int.from_bytes(raw.ljust(8, b'\0'), 'big'))
+        if not diff:
+            return
+        self.mask |= diff
+        # Percorre só os bits alterados, do menos para o mais significativo
+        counts = self.counts
+        while diff:
+            low = diff & -diff
+            counts[low.bit_length() - 1] += 1
+            diff ^= low
+
+    def mask_str(self, length):
+        """Máscara dos bits que alternaram, como 'FF 00 ...' em 'length' bytes."""
+        return self.mask.to_bytes(8, 'big')[:length].hex(' ').upper()
+
+    def hottest(self):
+        """Retorna (bit, alternâncias) do bit que mais alternou, ou None se
+        nenhum bit alternou ainda."""
+        count = max(self.counts)
+        if not count:
+            return None
+        return self.counts.index(count), count
@@ -0,0 +1,529 @@
+"""
+can_tui.py - núcleo compartilhado dos sniffers CAN em curses
+
+Usado por cansniffer.py (só visualização) e cansniffer_interactive.py
+(visualização + envio de frames e geradores cíclicos). Cada front-end
+monta seus argumentos, cria um State e chama run(state).
+
+Comandos em tempo de execução (todos os front-ends):
+  q       - sair
+  c       - alternar cor on/off
+  a       - alternar análise de bits (máscara dos bits que mudaram)
+  f       - limpar filtros
+  +<ID>   - habilitar filtro para esse CAN ID (Enter confirma; 8 dígitos confirmam sozinhos)
+  -<ID>   - desabilitar filtro para esse CAN ID
+
+Só com geradores habilitados:
+  s       - enviar um frame (uma vez)
+  g       - gerar um frame ciclicamente (cangen)
+  p       - parar todos os geradores
+"""
+import sys
+import re
+import time
+import heapq
+import bisect
+import curses
+from queue import Queue, Full, Empty
+from collections import OrderedDict
+from can import Bus, Message, BufferedReader, Notifier
+from can_analysis import BitToggles
+
+# --- Constantes ---
+HEX_DIGITS = frozenset('0123456789ABCDEFabcdef')
+# Formato de uma linha da tabela: ID, Count, Last, Data
+_ROW_FMT = "%7s %7d   %-8s   %s"
+# Máximo de frames drenados do bus por renderização
+RECV_BATCH = 1000
+# Espera máxima entre tentativas de reconexão (s)
+RECONNECT_MAX = 16.0
+# Máximo de frames aguardando na fila de recepção
+RX_QUEUE_MAX = 10000
+# Timeout do recv() na thread de recepção (s)
+RX_TIMEOUT = 0.1
+
+# --- Regex para comandos ---
+frame_re = re.compile(r'^([0-9A-Fa-f]{3,8})#([0-9A-Fa-f]{0,16})$')
+
+class State:
+    """Estado de uma sessão do sniffer: tabela, filtros, geradores e tela."""
+
+    def __init__(self, args, enable_generators=False, bus=None):
+        self.args = args
+        self.enable_generators = enable_generators
+        self.bus = bus
+        self.stats = OrderedDict()  # { '3E8': Entry }, do menos ao mais recente
+        self.display_cids = []      # chaves de 'stats' em ordem de exibição
+        self.filters = set()        # IDs habilitados; vazio = todos
+        self.use_color = True
+        self.last_error = ""
+        # Mensagens cíclicas: { 'ID#DATA': {'interval': 0.1, 'msg': Message} }
+        self.cyclical_messages = {}
+        # Próximos envios dos geradores, ordenados por prazo: [(deadline, 'ID#DATA')]
+        self.gen_heap = []
+        # Análise de bits (tecla 'a'): { '3E8': BitToggles }, ou None se desligada
+        self.analysis = None
+        # Comando +ID/-ID sendo digitado (ex: '+3E'), ou None
+        self.pending_filter = None
+        # Conteúdo já desenhado na tela: { row: chave da linha }
+        self.prev_lines = {}
+
+class Entry:
+    """Estado exibido de um CAN ID: último payload, contagem e horário."""
+    __slots__ = ('raw', 'data', 'count', 'last', 'changed')
+
+    def __init__(self):
+        self.raw = b''
+        self.data = ''
+        self.count = 0
+        self.last = ''
+        self.changed = False
+
+def open_bus(args):
+    """Abre o bus conforme o backend ('slcan' se o front-end não tiver --backend)."""
+    if getattr(args, 'backend', 'slcan') == 'slcan':
+        return Bus(interface='slcan', channel=args.interface, bitrate=args.bitrate)
+    else:
+        return Bus(interface='socketcan', channel=args.interface)
+
+class RxReader(BufferedReader):
+    """Fila de recepção do Notifier que guarda o erro do bus em vez de
+    derrubar a thread, para o loop principal poder reconectar.
+
+    A fila é limitada a RX_QUEUE_MAX frames: se o loop principal parar de
+    drenar (ex: prompt s/g aberto), os frames mais antigos são descartados."""
+    def __init__(self):
+        super().__init__()
+        self.buffer = Queue(maxsize=RX_QUEUE_MAX)
+        self.error = None
+
+    def on_message_received(self, msg):
+        # Só a thread do Notifier insere, então o laço termina
+        while True:
+            try:
+                self.buffer.put_nowait(msg)
+                return
+            except Full:
+                try:
+                    self.buffer.get_nowait()
+                except Empty:
+                    pass
+
+    def on_error(self, exc):
+        self.error = exc
+        # O Notifier tenta recv() de novo logo em seguida; sem esta pausa a
+        # thread gira a 100% de CPU até o loop principal parar a recepção
+        time.sleep(RX_TIMEOUT)
+
+def start_rx(bus):
+    """Inicia a recepção em segundo plano; retorna (reader, notifier)."""
+    reader = RxReader()
+    return reader, Notifier(bus, [reader], timeout=RX_TIMEOUT)
+
+def stop_rx(notifier, bus):
+    """Para a recepção e fecha o bus, ignorando erros de um bus já morto."""
+    try:
+        notifier.stop()
+    except Exception:
+        pass
+    try:
+        bus.shutdown()
+    except Exception:
+        pass
+
+def parse_frame_string(frame_str):
+    """Interpreta uma string 'ID#DATA' e retorna um objeto Message."""
+    # Caminho rápido para o caso comum: ID standard de 3 dígitos e até
+    # 8 bytes de dados, sem regex. Qualquer outra coisa vai para o regex.
+    if (len(frame_str) <= 20 and len(frame_str) % 2 == 0
+            and frame_str[3:4] == '#'
+            and HEX_DIGITS.issuperset(frame_str[:3])
+            and HEX_DIGITS.issuperset(frame_str[4:])):
+        return Message(arbitration_id=int(frame_str[:3], 16),
+                       data=bytes.fromhex(frame_str[4:]), is_extended_id=False)
+    return _parse_frame_string_re(frame_str)
+
+def _parse_frame_string_re(frame_str):
+    """Versão completa de parse_frame_string (IDs estendidos, validação)."""
+    m = frame_re.match(frame_str)
+    if not m:
+        raise ValueError(f"Formato inválido: '{frame_str}'")
+
+    id_str, data_str = m.groups()
+    can_id = int(id_str, 16)
+    is_extended = len(id_str) > 3
+    data = bytes.fromhex(data_str) if data_str else b''
+
+    if len(data) > 8:
+        raise ValueError("Dados > 8 bytes!")
+
+    return Message(arbitration_id=can_id, data=data, is_extended_id=is_extended)
+
+# Cache de strings de ID por arbitration_id (standard e estendido)
+_cid_cache_std = {}
+_cid_cache_ext = {}
+
+def cid_for(msg):
+    """Retorna o ID formatado da mensagem, formatando cada ID só uma vez."""
+    cache = _cid_cache_ext if msg.is_extended_id else _cid_cache_std
+    cid = cache.get(msg.arbitration_id)
+    if cid is None:
+        cid = format(msg.arbitration_id, '08X' if msg.is_extended_id else '03X')
+        cache[msg.arbitration_id] = cid
+    return cid
+
+# Último horário formatado, refeito só quando muda o segundo
+_last_ts_sec = 0
+_last_ts_str = ''
+
+def _timestamp():
+    """Retorna o horário atual em HH:MM:SS, chamando strftime uma vez por segundo."""
+    global _last_ts_sec, _last_ts_str
+    sec = int(time.time())
+    if sec != _last_ts_sec:
+        _last_ts_sec = sec
+        _last_ts_str = time.strftime("%H:%M:%S", time.localtime(sec))
+    return _last_ts_str
+
+def _evict_oldest(state):
+    """Descarta o CAN ID visto há mais tempo (limite --max-ids)."""
+    cid, _ = state.stats.popitem(last=False)
+    del state.display_cids[bisect.bisect_left(state.display_cids, cid)]
+    if state.analysis is not None:
+        state.analysis.pop(cid, None)
+    cache = _cid_cache_ext if len(cid) > 3 else _cid_cache_std
+    cache.pop(int(cid, 16), None)
+
+def _update_stats(state, msg, timestamp):
+    """Atualiza 'state.stats' com um frame recebido em 'timestamp'."""
+    cid = cid_for(msg)
+    raw = bytes(msg.data)
+
+    entry = state.stats.get(cid)
+    if entry is None:
+        entry = state.stats[cid] = Entry()
+        bisect.insort(state.display_cids, cid)
+        if len(state.stats) > state.args.max_ids:
+            _evict_oldest(state)
+    else:
+        state.stats.move_to_end(cid)
+    # Compara o payload cru; o texto hex só é refeito quando muda
+    if entry.raw != raw:
+        if state.analysis is not None and entry.count:
+            toggles = state.analysis.get(cid)
+            if toggles is None:
+                toggles = state.analysis[cid] = BitToggles()
+            toggles.update(entry.raw, raw)
+        entry.changed = True
+        entry.raw = raw
+        entry.data = raw.hex(' ').upper()
+
+    entry.count += 1
+    entry.last = timestamp
+
+def apply_filter(state, cmd):
+    """Aplica um comando '+ID'/'-ID' completo ao conjunto de filtros."""
+    sign, id_raw = cmd[0], cmd[1:]
+    cid = id_raw.zfill(3) if len(id_raw) <= 3 else id_raw.zfill(8)
+    if sign == '+':
+        state.filters.add(cid)
+    else:
+        state.filters.discard(cid)
+
+def put_line(state, stdscr, row, key, attr, render, *render_args):
+    """Escreve a linha 'row' apenas se 'key' mudou desde o último frame;
+    o texto só é montado (render(*render_args)) nesse caso."""
+    if state.prev_lines.get(row) == key:
+        return
+    stdscr.addstr(row, 0, render(*render_args), attr)
+    state.prev_lines[row] = key
+
+def _fit(text, width):
+    """Trunca/completa 'text' para a largura da tela."""
+    return text[:width].ljust(width)
+
+def _format_row(state, cid, entry, width):
+    """Monta o texto de uma linha da tabela (dados ou análise de bits)."""
+    data = entry.data
+    if state.analysis is not None:
+        toggles = state.analysis.get(cid)
+        hottest = toggles.hottest() if toggles is not None else None
+        if hottest is None:
+            data = "-"
+        else:
+            data = f"{toggles.mask_str(len(entry.raw))}  (bit {hottest[0]}: {hottest[1]}x)"
+    return _fit(_ROW_FMT % (cid, entry.count, entry.last, data), width)
+
+def invalidate(state, stdscr):
+    """Força o redesenho completo no próximo doupdate (resize, filtros)."""
+    state.prev_lines.clear()
+    stdscr.clearok(True)
+
+def flush_screen(state):
+    """curses.doupdate(); com --sync, entre marcadores DECSET 2026 para o
+    terminal exibir o frame inteiro de uma vez (ignorado se não suportado)."""
+    if state.args.sync:
+        sys.stdout.write("\x1b[?2026h")
+        sys.stdout.flush()
+    curses.doupdate()
+    if state.args.sync:
+        sys.stdout.write("\x1b[?2026l")
+        sys.stdout.flush()
+
+def draw_screen(stdscr, state):
+    max_y, max_x = stdscr.getmaxyx()
+    width = max_x - 1
+
+    if state.enable_generators:
+        header = " ID      Count   Last       Data (q=sair s=send g=gen p=purge c=cor a=bits +/-ID=filt)"
+    else:
+        header = " ID      Count   Last       Data (q=sair c=cor a=bits f=limpa +/-ID=filt)"
+    try:
+        put_line(state, stdscr, 0, (header, width), 0, _fit, header, width)
+    except curses.error:
+        return
+
+    row = 1
+    stats, filters = state.stats, state.filters
+    for cid in state.display_cids:
+        if row >= max_y - 2: break
+        if filters and cid not in filters:
+            continue
+        entry = stats[cid]
+        attr = 0
+        if state.use_color and entry.changed:
+            attr = curses.color_pair(1)
+            entry.changed = False
+        # 'count' muda a cada frame: mesma entrada e count = mesma linha
+        try:
+            put_line(state, stdscr, row, (entry, entry.count, attr), attr,
+                     _format_row, state, cid, entry, width)
+        except curses.error:
+            pass
+        row += 1
+
+    # Limpa as linhas que sobraram do frame anterior (inclui o rodapé)
+    for r in [r for r in state.prev_lines if r >= row]:
+        del state.prev_lines[r]
+    try:
+        stdscr.move(row, 0)
+        stdscr.clrtobot()
+    except curses.error:
+        pass
+
+    # Rodapé com status
+    status_bar = state.last_error
+    if state.enable_generators:
+        cyclical_messages = state.cyclical_messages
+        gen_status = f"Gerando: {', '.join(cyclical_messages.keys())}" if cyclical_messages else "Geradores: 0"
+        status_bar = f"{gen_status} | {status_bar}"
+    if state.pending_filter is not None:
+        status_bar = f"Filtro: {state.pending_filter}_ | {status_bar}"
+    try:
+        stdscr.addstr(max_y - 1, 0, status_bar[:width], curses.A_REVERSE)
+    except curses.error:
+        pass
+
+    stdscr.noutrefresh()
+
+def _prompt_send(stdscr, state, is_generator):
+    """Pede um frame (e o intervalo, para geradores) e envia/agenda."""
+    max_y, max_x = stdscr.getmaxyx()
+    curses.echo()
+    stdscr.nodelay(False)
+
+    prompt_y = max_y - 1
+    stdscr.addstr(prompt_y, 0, " " * (max_x - 1), curses.A_REVERSE)
+
+    prompt_frame = "Frame (ID#DADOS): "
+    stdscr.addstr(prompt_y, 0, prompt_frame, curses.A_REVERSE)
+    stdscr.noutrefresh()
+    flush_screen(state)
+    frame_to_send = stdscr.getstr(prompt_y, len(prompt_frame), 30).decode('utf-8').upper()
+
+    interval_ms = "100" # Default interval for generators
+    if is_generator and frame_to_send:
+        prompt_interval = f"Intervalo em ms (padrão {interval_ms}): "
+        stdscr.addstr(prompt_y, 0, " " * (max_x - 1), curses.A_REVERSE)
+        stdscr.addstr(prompt_y, 0, prompt_interval, curses.A_REVERSE)
+        stdscr.noutrefresh()
+        flush_screen(state)
+        user_interval = stdscr.getstr(prompt_y, len(prompt_interval), 5).decode('utf-8')
+        if user_interval.isdigit():
+            interval_ms = user_interval
+
+    curses.noecho()
+    stdscr.nodelay(True)
+
+    # --- Execução do comando ---
+    if frame_to_send:
+        try:
+            # Valida o formato; geradores reutilizam a Message
+            msg = parse_frame_string(frame_to_send)
+            if is_generator:
+                interval_sec = int(interval_ms) / 1000.0
+                if frame_to_send not in state.cyclical_messages:
+                    heapq.heappush(state.gen_heap, (time.monotonic(), frame_to_send))
+                state.cyclical_messages[frame_to_send] = {'interval': interval_sec, 'msg': msg}
+                state.last_error = f"Gerando {frame_to_send} a cada {interval_ms}ms"
+            elif state.bus:
+                state.bus.send(msg)
+                state.last_error = f"Enviado: {frame_to_send}"
+        except Exception as e:
+            state.last_error = f"Erro: {e}"
+    else:
+        state.last_error = "Envio cancelado."
+
+def _handle_key(stdscr, state, key):
+    """Trata uma tecla; retorna False se o usuário pediu para sair."""
+    ch = chr(key) if key < 256 else ''
+
+    # --- Filtro +ID/-ID sendo digitado ---
+    # Acumula dígitos hex até Enter (ou 8 dígitos); qualquer outra
+    # tecla cancela e segue como comando normal
+    if state.pending_filter is not None and key != curses.KEY_RESIZE:
+        if ch in HEX_DIGITS:
+            state.pending_filter += ch.upper()
+            if len(state.pending_filter) == 9:
+                apply_filter(state, state.pending_filter)
+                state.pending_filter = None
+                invalidate(state, stdscr)
+            return True
+        elif (ch == '\n' or key == curses.KEY_ENTER) and len(state.pending_filter) > 1:
+            apply_filter(state, state.pending_filter)
+            state.pending_filter = None
+            invalidate(state, stdscr)
+            return True
+        state.pending_filter = None
+
+    # --- Comandos ---
+    if key == curses.KEY_RESIZE: invalidate(state, stdscr)
+    elif ch in ('q', 'Q'): return False
+    elif ch in ('+', '-'): state.pending_filter = ch
+    elif ch in ('c', 'C'): state.use_color = not state.use_color
+    elif ch in ('a', 'A'):
+        # Cada ativação começa uma nova janela de análise
+        state.analysis = {} if state.analysis is None else None
+        invalidate(state, stdscr)
+        state.last_error = "Análise de bits ligada." if state.analysis is not None else "Análise de bits desligada."
+    elif ch in ('f', 'F'):
+        state.filters.clear()
+        invalidate(state, stdscr)
+        state.last_error = "Filtros limpos."
+    elif not state.enable_generators:
+        pass
+    elif ch in ('p', 'P'): # Purge generators
+        state.cyclical_messages.clear()
+        state.gen_heap.clear()
+        state.last_error = "Geradores parados."
+    elif ch in ('s', 'S') or ch in ('g', 'G'): # Send or Generate
+        _prompt_send(stdscr, state, ch in ('g', 'G'))
+    return True
+
+def main_loop(stdscr, state):
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    if curses.has_colors():
+        curses.start_color()
+        curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
+        curses.init_pair(2, curses.COLOR_BLACK, curses.COLOR_WHITE)
+
+    if state.bus is None:
+        try:
+            state.bus = open_bus(state.args)
+        except Exception as e:
+            state.last_error = f"Erro ao abrir bus: {e}"
+    if state.bus:
+        reader, notifier = start_rx(state.bus)
+    gen_heap = state.gen_heap
+    dirty = True # Redesenha apenas quando algo mudou
+    backoff = 1.0 # Espera atual entre tentativas de reconexão
+    next_reconnect_try = time.monotonic() + backoff
+
+    while True:
+        now = time.monotonic()
+        bus = state.bus
+
+        # --- Processa os geradores cíclicos que venceram ---
+        if bus and gen_heap:
+            due = []
+            while gen_heap and gen_heap[0][0] <= now:
+                due.append(heapq.heappop(gen_heap))
+            for deadline, frame_str in due:
+                details = state.cyclical_messages.get(frame_str)
+                if details is None:
+                    continue
+                try:
+                    bus.send(details['msg'])
+                except Exception as e:
+                    state.last_error = f"Erro no gerador: {e}"
+                # Reagenda; se ficou para trás, não tenta compensar em rajada
+                deadline += details['interval']
+                if deadline <= now:
+                    deadline = now + details['interval']
+                heapq.heappush(gen_heap, (deadline, frame_str))
+                dirty = True
+
+        # Espera um frame da thread de recepção e drena os que já estão na
+        # fila antes de redesenhar
+        if bus:
+            # Espera no máximo até o próximo gerador vencer
+            timeout = min(0.1, gen_heap[0][0] - now) if gen_heap else 0.1
+            msg = reader.get_message(timeout=max(0.0, timeout))
+            pending = RECV_BATCH
+            timestamp = _timestamp()
+            while msg is not None:
+                _update_stats(state, msg, timestamp)
+                dirty = True
+                pending -= 1
+                if not pending:
+                    break
+                msg = reader.get_message(timeout=0.0)
+            if reader.error is not None:
+                stop_rx(notifier, bus)
+                state.bus = None
+                state.last_error = f"Erro no recv: {reader.error}"
+                backoff = 1.0
+                next_reconnect_try = time.monotonic() + backoff
+                dirty = True
+
+        else:
+            # Reconecta sem bloquear o loop: o teclado continua respondendo
+            if now >= next_reconnect_try:
+                try:
+                    state.bus = open_bus(state.args)
+                    reader, notifier = start_rx(state.bus)
+                    state.last_error = ""
+                except Exception as e:
+                    state.last_error = f"Erro ao abrir bus: {e}"
+                    backoff = min(RECONNECT_MAX, backoff * 2)
+                    next_reconnect_try = now + backoff
+                dirty = True
+            if not state.bus:
+                time.sleep(0.1)
+
+        # Processa entrada do usuário
+        try:
+            key = stdscr.getch()
+            if key != -1:
+                dirty = True
+                if not _handle_key(stdscr, state, key):
+                    break
+        except Exception: pass # Ignora erros de input
+
+        # Renderização: uma única atualização do terminal por iteração
+        if dirty:
+            draw_screen(stdscr, state)
+            flush_screen(state)
+            dirty = False
+
+    if state.bus: stop_rx(notifier, state.bus)
+
+def run(state):
+    """Executa o sniffer em curses até o usuário sair."""
+    try:
+        curses.wrapper(main_loop, state)
+    except curses.error as e:
+        print(f"Erro de Curses: {e}. A janela do terminal é muito pequena?")
+    except Exception as e:
+        print(f"Erro fatal: {e}")
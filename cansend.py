@@ -16,35 +16,40 @@ Exemplos:
     cansend.py /dev/cu.usbserial-A5069RR4 321#R
 """
 import sys
-import re
 from can import Bus, Message, CanError
 
+HEX_DIGITS = frozenset('0123456789ABCDEFabcdef')
+
 def print_usage(prog):
     print(f"Uso: {prog} <serial_device> <can_frame>")
     print("Exemplo: 123#DEADBEEF para dados, 321#R para RTR")
     sys.exit(1)
 
-# corresponde a <ID>#{DATA} ou <ID>#R{LEN}
-frame_re = re.compile(r'^([0-9A-Fa-f]{3,8})#([0-9A-Fa-f\.]{0,16}|[Rr][0-9]?)$')
-
+# <ID>#{DATA} ou <ID>#R{LEN}: ID com 3 a 8 dígitos hex
 def parse_frame(frame_str):
-    m = frame_re.match(frame_str)
-    if not m:
+    pos = frame_str.find('#')
+    if not 3 <= pos <= 8 or not HEX_DIGITS.issuperset(frame_str[:pos]):
         raise ValueError(f"Formato inválido: '{frame_str}'")
-    id_str, data_str = m.groups()
+    id_str, data_str = frame_str[:pos], frame_str[pos+1:]
     can_id = int(id_str, 16)
     is_ext = len(id_str) > 3
     # RTR?
-    if data_str and data_str[0] in 'Rr':
+    if data_str[:1] in ('R', 'r'):
         is_rtr = True
-        dlc = int(data_str[1], 16) if len(data_str) > 1 else 0
-        data = []
+        len_str = data_str[1:]
+        if len(len_str) > 1 or (len_str and len_str not in '0123456789'):
+            raise ValueError(f"Formato inválido: '{frame_str}'")
+        dlc = int(len_str) if len_str else 0
+        data = b''
     else:
         is_rtr = False
+        # bytes.fromhex ignora espaços: valida os dígitos antes
         hex_str = data_str.replace('.', '')
-        if len(hex_str) % 2 != 0:
+        if not HEX_DIGITS.issuperset(hex_str):
+            raise ValueError(f"Formato inválido: '{frame_str}'")
+        if len(hex_str) % 2:
             raise ValueError("Hex de dados deve ter número par de dígitos")
-        data = [int(hex_str[i:i+2], 16) for i in range(0, len(hex_str), 2)]
+        data = bytes.fromhex(hex_str)
         dlc = len(data)
     if dlc > 8:
         raise ValueError("DLC inválido (máximo 8)")
@@ -83,7 +88,7 @@ def main():
             suffix = 'R' + (f"{dlc:X}" if dlc else '')
             print(f"{id_str}#{suffix} enviado")
         else:
-            hex_data = ''.join(f"{b:02X}" for b in data)
+            hex_data = data.hex().upper()
             print(f"{id_str}#{hex_data} enviado")
     except CanError as e:
         print(f"Falha ao enviar: {e}")